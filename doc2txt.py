@@ -3,17 +3,20 @@
 
 import logging
 import os
+import re
 import shutil
 import sys
 import textwrap
+from contextlib import suppress
 from pathlib import Path  # https://docs.python.org/3/library/pathlib.html
 from subprocess import PIPE, Popen, call
 from urllib.request import urlopen
 
 HOME = os.path.expanduser("~")
 DST_FILE = HOME + "/tmp/.pw/dt-result.txt"
-PANDOC_BIN = shutil.which("pandoc")
+PANDOC_BIN = os.environ.get("PW_PANDOC_BIN") or shutil.which("pandoc")
 VISUAL = os.environ["VISUAL"]
+BLANK_LINE_RE = re.compile(r"^[^\S\n]+(\n|\Z)", re.MULTILINE)  # whitespace-only line
 if not all([HOME, VISUAL, PANDOC_BIN]):
     raise FileNotFoundError("Your environment is not configured correctly")
 
@@ -27,14 +30,115 @@ def rotate_files(filename, max_rot=5):
     """Create at most {max_rot} rotating files."""
     bare, ext = os.path.splitext(filename)
     for counter in reversed(range(2, max_rot + 1)):
-        old_filename = f"{bare}{counter-1}{ext}"
-        new_filename = f"{bare}{counter}{ext}"
-        if os.path.exists(old_filename):
-            os.rename(old_filename, new_filename)
-    if os.path.exists(filename):
+        with suppress(FileNotFoundError):  # rename if present
+            os.rename(f"{bare}{counter-1}{ext}", f"{bare}{counter}{ext}")
+    with suppress(FileNotFoundError):
         os.rename(filename, f"{bare}1{ext}")
 
 
+# Each command builder returns (command, wrap options, whether url is piped
+# to stdin). I prefer to use the programs native wrap if possible.
+
+
+def markdown_command(args, url, file_name, extension):
+    """file2mdn via pandoc."""
+    wrap = "" if args.wrap else "--wrap=none"
+    columns = 70
+    command = [
+        PANDOC_BIN,
+        "-f",
+        f"{extension}",
+        "-t",
+        "markdown-simple_tables-pipe_tables-multiline_tables",
+        "--reference-links",
+        "--reference-location=block",
+        "--columns",
+        f"{columns}",
+        "-o",
+        DST_FILE,
+    ]
+    return command, wrap, True
+
+
+def plain_command(args, url, file_name, extension):
+    """file2txt via pandoc."""
+    wrap = "" if args.wrap else "--wrap=none"
+    columns = 70
+    command = [
+        PANDOC_BIN,
+        "-f",
+        f"{extension}",
+        "-t",
+        "plain",
+        "--columns",
+        f"{columns}",
+        "-o",
+        DST_FILE,
+    ]
+    return command, wrap, True
+
+
+def lynx_command(args, url, file_name, extension):
+    """html2txt via lynx."""
+    wrap = "-width 70" if args.wrap else "-width 1024"
+    command = [
+        "lynx",
+        "-dump",
+        "-nonumbers",
+        "-display_charset=utf-8",
+        url,
+    ]
+    return command, wrap, False
+
+
+def links_command(args, url, file_name, extension):
+    """html2txt via links."""
+    wrap = "-width 70" if args.wrap else "-width 512"
+    return ["links", "-dump", url], wrap, False
+
+
+def w3m_command(args, url, file_name, extension):
+    """html2txt via w3m."""
+    wrap = "-cols 70" if args.wrap else ""
+    return ["w3m", "-dump", "-cols", "70", url], wrap, False
+
+
+def antiword_command(args, url, file_name, extension):
+    """doc2txt via antiword."""
+    wrap = "-w 70" if args.wrap else "-w 0"
+    return ["antiword", url[7:]], wrap, False  # remove 'file://'
+
+
+# def catdoc_command(args, url, file_name, extension):
+#     """Now deprecated, not available on homebrew."""
+#     wrap = '' if args.wrap else '-w'
+#     return ['catdoc', url], wrap, False
+
+
+def docx2txt_command(args, url, file_name, extension):
+    """docx2txt via docx2txt."""
+    wrap = ""  # maybe use fold instead?
+    return ["docx2txt.pl", file_name, "-"], wrap, False
+
+
+def pdftotext_command(args, url, file_name, extension):
+    """pdf2txt via pdftotext."""
+    wrap = ""
+    return ["pdftotext", "-layout", "-nopgbrk", file_name, "-"], wrap, False
+
+
+# option name and its command builder, in order of precedence
+BACKENDS = (
+    ("markdown", markdown_command),
+    ("plain", plain_command),
+    ("lynx", lynx_command),
+    ("links", links_command),
+    ("w3m", w3m_command),
+    ("antiword", antiword_command),
+    ("docx2txt", docx2txt_command),
+    ("pdftotext", pdftotext_command),
+)
+
 if __name__ == "__main__":
     import argparse  # http://docs.python.org/dev/library/argparse.html
 
@@ -152,132 +256,71 @@ if __name__ == "__main__":
 
     file_name = args.filename[0]
     extension = Path(file_name).suffix[1:]
-    info(f"** file_name = {file_name}")
-    info(f"** extension = {extension}")
+    info("** file_name = %s", file_name)
+    info("** extension = %s", extension)
     if file_name.startswith("http"):
         url = file_name
         if "docs.google.com" in url:
-            url = url.replace("/edit", "/export")
+            url = url.replace("/edit", "/export", 1)
     elif os.path.exists(file_name):
         file_path = os.path.abspath(file_name)
-        info(f"path = {file_path}")
+        info("path = %s", file_path)
         url = f"file://{file_path}"
     else:
         print(f"ERROR: Cannot find {file_name}")
         sys.exit()
-    info(f"** url = {url}")
+    info("** url = %s", url)
 
-    content = None
     rotate_files(DST_FILE)
     # os.remove(DST_FILE) if os.path.exists(DST_FILE) else None
 
     # default is lynx; args.catdoc now removed
-    if not any(
-        (
-            args.lynx,
-            args.plain,
-            args.markdown,
-            args.links,
-            args.w3m,
-            args.antiword,
-            args.docx2txt,
-            args.pdftotext,
-        )
-    ):
+    if not any(getattr(args, name) for name, _ in BACKENDS):
         args.lynx = True
 
     if extension == "md":
         extension = "markdown"
     extension = "html" if not extension else extension
-    info(f"** extension = {extension}")
-
-    # I prefer to use the programs native wrap if possible
-    if args.markdown:
-        content = urlopen(url).read()
-        wrap = "" if args.wrap else "--wrap=none"
-        columns = 70
-        command = [
-            PANDOC_BIN,
-            "-f",
-            f"{extension}",
-            "-t",
-            "markdown-simple_tables-pipe_tables-multiline_tables",
-            "--reference-links",
-            "--reference-location=block",
-            "--columns",
-            f"{columns}",
-            "-o",
-            DST_FILE,
-        ]
-    elif args.plain:
-        content = urlopen(url).read()
-        wrap = "" if args.wrap else "--wrap=none"
-        columns = 70
-        command = [
-            PANDOC_BIN,
-            "-f",
-            f"{extension}",
-            "-t",
-            "plain",
-            "--columns",
-            f"{columns}",
-            "-o",
-            DST_FILE,
-        ]
-    elif args.lynx:
-        wrap = "-width 70" if args.wrap else "-width 1024"
-        command = [
-            "lynx",
-            "-dump",
-            "-nonumbers",
-            "-display_charset=utf-8",
-            url,
-        ]
-    elif args.links:
-        wrap = "-width 70" if args.wrap else "-width 512"
-        command = ["links", "-dump", url]
-    elif args.w3m:
-        wrap = "-cols 70" if args.wrap else ""
-        command = ["w3m", "-dump", "-cols", "70", url]
-    elif args.antiword:
-        wrap = "-w 70" if args.wrap else "-w 0"
-        url = url[7:]  # remove 'file://'
-        command = ["antiword", url]
-    # elif args.catdoc:  # now deprecated, not available on homebrew
-    #     wrap = '' if args.wrap else '-w'
-    #     command = ['catdoc', url]
-    elif args.docx2txt:
-        wrap = ""  # maybe use fold instead?
-        command = ["docx2txt.pl", file_name, "-"]
-    elif args.pdftotext:
-        wrap = ""
-        command = ["pdftotext", "-layout", "-nopgbrk", file_name, "-"]
-    else:
-        print("ERROR: no conversion program specified")
+    info("** extension = %s", extension)
+
+    builder = next(builder for name, builder in BACKENDS if getattr(args, name))
+    command, wrap, stream_url = builder(args, url, file_name, extension)
 
     command[1:1] = wrap.split()  # insert wrap args after command
     print(f"** command = {command} on {url}")
-    process = Popen(command, stdin=PIPE, stdout=open(DST_FILE, "w"))
-    process.communicate(input=content)
+    with open(DST_FILE, "w") as dst_fd:
+        # open the url first, so a failed fetch never leaves pandoc waiting
+        response = urlopen(url) if stream_url else None
+        process = Popen(command, stdin=PIPE, stdout=dst_fd)
+        if response:  # pandoc reads while the rest downloads
+            try:
+                with response, suppress(BrokenPipeError):
+                    shutil.copyfileobj(response, process.stdin, 65536)
+            except BaseException:
+                process.kill()
+                process.wait()
+                raise
+        process.communicate()
 
     if args.wrap or args.quote:
         with open(DST_FILE) as f:
-            new_content = []
-            for line in f.readlines():
-                if line.isspace():
-                    line = "\n"
-                if args.wrap and wrap == "":  # wrap if no native wrap
-                    info("wrapping")
-                    line = textwrap.fill(line, 70).strip() + "\n"
-                if args.quote:
-                    info("quoting")
-                    line = line.replace("\n", "\n> ")
-                new_content.append(line)
-            content = "".join(new_content)
-            if args.quote:
-                content = "> " + content
-        with open(DST_FILE, "w") as f:
-            f.write(content)
+            content = f.read()
+        if args.wrap and wrap == "":  # wrap if no native wrap
+            info("wrapping")
+            lines = content.split("\n")
+            if not lines[-1]:  # no line after the final newline
+                lines.pop()
+            content = "".join(textwrap.fill(line, 70).strip() + "\n" for line in lines)
+            changed = True
+        else:
+            content, changed = BLANK_LINE_RE.subn("\n", content)
+        if args.quote:
+            info("quoting")
+            content = "> " + content.replace("\n", "\n> ")
+            changed = True
+        if changed:  # natively wrapped output often needs no rewrite
+            with open(DST_FILE, "w") as f:
+                f.write(content)
 
     os.chmod(DST_FILE, 0o600)
     call([VISUAL, DST_FILE])
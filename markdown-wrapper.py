@@ -25,16 +25,18 @@
 #       b. append output of md2bib.py
 
 import argparse
-import codecs
+import functools
 import logging as log
 import os
 import re
 import shutil
 import sys
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from pathlib import Path
 from subprocess import Popen, call
-from urllib.parse import urlparse
 
 import lxml.etree as et  # type: ignore
 from lxml.html import tostring  # type: ignore
@@ -44,7 +46,8 @@ import md2bib
 HOME = Path.home()
 WEBROOT = HOME / "e/clear/data/2web/reagle.org"
 BROWSER = os.environ["BROWSER"].replace("*", " ")
-PANDOC_BIN = Path(shutil.which("pandoc"))  # type: ignore # test for None below
+# a parent run passes on its pandoc so children skip the PATH search
+PANDOC_BIN = Path(os.environ.get("PW_PANDOC_BIN") or shutil.which("pandoc"))  # type: ignore # test for None below
 MD_BIN = Path(shutil.which("markdown-wrapper.py"))  # type: ignore # test for None below
 if not all([HOME, BROWSER, PANDOC_BIN, MD_BIN]):
     raise FileNotFoundError("Your environment is not configured correctly")
@@ -52,46 +55,116 @@ if not all([HOME, BROWSER, PANDOC_BIN, MD_BIN]):
 FONTAWESOME_URL = "https://reagle.org/joseph/talks/_custom/fontawesome/css/all.min.css"
 HANDOUTS_URL = "https://reagle.org/joseph/talks/_custom/class-handouts-201306.css"
 
+# per-thread state: an lxml parser must not be shared between threads
+THREAD_LOCAL = threading.local()
+BIB_LOCK = threading.Lock()  # one thread chunks/caches a bibliography at a time
+
+# TODO: harmonize within markdown-wrapper.py and with md2bib.py 2021-06-25
+PARENS_KEY = re.compile(
+    r"""
+    (-?@        # at-sign with optional negative
+    (?<!\\@)    # negative look behind for escape slash
+    [\w|-]+)    # one or more alhanumberics or hyphens
+    """,
+    re.VERBOSE,
+)  # -@Clark-Flory2010fpo
+PARENS_BRACKET_PAIR_LINK = re.compile(
+    r"""
+    \[[^\]\n]*  # opening bracket follow by 0+ non-closing bracket
+    [-#\\]?@    # at-sign preceded by optional hyphen or pound or escape
+    [^\]\n]+\]  # chars up to closing bracket
+    """,
+    re.VERBOSE,
+)
+PARENS_BRACKET_PAIR_QUASH = re.compile(
+    r"""
+    [ |^]       # space or caret
+    \[[^\[\n]+  # open_bracket followed by 1+ non-open_brackets
+    [-#]?@      # at-sign preceded by optional hyphen or pound
+    [^\]\n]+\]  # 1+ non-closing-brackets, closing bracket
+    """,
+    re.VERBOSE,
+)
+EM_RE = re.compile(r"(?<! _)_([^_]+?)_ ")
+SINGLE_QUOTE_RE = re.compile(r"(\W)'(.{2,40}?)'(\W)")
+LAZY_ELEMENTS_RE = re.compile(r"""(\<img|<iframe|<video)(.*?) src=""")
+QUASHED_CHUNK_RE = re.compile(r";[^;]*#@[^;]*")  # a citation chunk with #@
+YEAR_RE = re.compile(r"\d\d\d\d")
+TOP_SLIDE_RE = re.compile(r"^# (?!.*\{data-).*$", re.MULTILINE)
+
+
+@functools.cache
+def load_bib(bib_fn: Path, parse_func) -> dict[str, dict[str, str]]:
+    """Return chunked bibliography, parsed at most once per run."""
+    with BIB_LOCK:
+        return md2bib.chunk_cached(bib_fn, parse_func)
+
+
+def html_parser() -> et.HTMLParser:
+    """Return this thread's comment-stripping HTML parser."""
+    if not hasattr(THREAD_LOCAL, "html_parser"):
+        THREAD_LOCAL.html_parser = et.HTMLParser(
+            remove_comments=True, remove_blank_text=True
+        )
+    return THREAD_LOCAL.html_parser
 
-def hyperize(cite_match: re.Match[str], bib_chunked: dict[str, dict[str, str]]) -> str:
-    """Hyperize every non-overlapping occurrence and return to PARENS_KEY.sub."""
-    cite_replacement = []
-    url = None
-    citation = cite_match.group(0)
-    key = citation.split("@", 1)[1]
-    log.info(f"**   processing key: {key}")
-    reference = bib_chunked.get(key)
-    if reference is None:
-        print(f"WARNING: key {key} not found")
-        return key
-    else:
-        log.info(reference.keys())
-    url = reference.get("url")
+
+def make_hyperize(
+    bib_chunked: dict[str, dict[str, str]],
+) -> Callable[[re.Match[str]], str]:
+    """Return a hyperize replacement function with bib_chunked bound."""
+    get_reference = bib_chunked.get
+
+    def hyperize(cite_match: re.Match[str]) -> str:
+        """Hyperize every non-overlapping occurrence and return to PARENS_KEY.sub."""
+        citation = cite_match.group(0)
+        key = citation.split("@", 1)[1]
+        log.info(f"**   processing key: {key}")
+        reference = get_reference(key)
+        if reference is None:
+            print(f"WARNING: key {key} not found")
+            return key
+        return format_citation(
+            key,
+            citation.startswith("-"),
+            reference.get("url"),
+            reference.get("title-short"),
+            reference.get("original-date"),
+        )
+
+    return hyperize
+
+
+@functools.lru_cache(maxsize=1024)  # keys are typically cited repeatedly
+def format_citation(
+    key: str,
+    year_only: bool,
+    url: str | None,
+    title: str | None,
+    original_date: str | None,
+) -> str:
+    """Return the replacement text for a citation of key."""
     log.info(f"{url=}")
-    title = reference.get("title-short")
     log.info(f"{title=}")
-    last_name, year, _ = re.split(r"(\d\d\d\d)", key)
+    year_match = YEAR_RE.search(key)
+    last_name, year = key[: year_match.start()], year_match.group()
     if last_name.endswith("Etal"):
         last_name = last_name[0:-4] + " et al."
 
-    if "original-date" in reference:
-        year = f"{reference['original-date']}/{year}"
+    if original_date is not None:
+        year = f"{original_date}/{year}"
         log.info("original-date!")
-    if citation.startswith("-"):
-        key_text = re.findall(r"\d\d\d\d.*", key)[0]  # year
-    else:
-        key_text = f"{last_name} {year}"
+    key_text = key[year_match.start() :] if year_only else f"{last_name} {year}"
 
-    log.debug(f"**   url = {url}")
     if url:
-        cite_replacement.append(f"[{key_text}]({url})")
+        cite_replacement = f"[{key_text}]({url})"
     elif title:
         title = title.replace("{", "").replace("}", "")
-        cite_replacement.append(f'{key_text}, "{title}"')
+        cite_replacement = f'{key_text}, "{title}"'
     else:
-        cite_replacement.append(f"{key_text}")
-    log.debug(f"**   using {cite_replacement}=")
-    return "".join(cite_replacement)
+        cite_replacement = key_text
+    log.debug(f"**   using {cite_replacement=}")
+    return cite_replacement
 
 
 def make_parens(cite_match: re.Match[str]) -> str:
@@ -99,96 +172,78 @@ def make_parens(cite_match: re.Match[str]) -> str:
     return "(" + cite_match.group(0)[1:-1] + ")"
 
 
-def link_citations(line: str, bib_chunked: dict[str, dict[str, str]]) -> str:
+def link_citations(text: str, bib_chunked: dict[str, dict[str, str]]) -> str:
     """Turn pandoc/markdown citations into links within parenthesis.
 
     Used only with citations in presentations.
+    text may be a line or a whole document; matches never span lines.
     """
-    # TODO: harmonize within markdown-wrapper.py and with md2bib.py 2021-06-25
-    PARENS_KEY = re.compile(
-        r"""
-        (-?@        # at-sign with optional negative
-        (?<!\\@)    # negative look behind for escape slash
-        [\w|-]+)    # one or more alhanumberics or hyphens
-        """,
-        re.VERBOSE,
-    )  # -@Clark-Flory2010fpo
-
-    # TODO: harmonize within markdown-wrapper.py and with md2bib.py 2021-06-25
-    PARENS_BRACKET_PAIR = re.compile(
-        r"""
-        \[[^\]]*    # opening bracket follow by 0+ non-closing bracket
-        [-#\\]?@    # at-sign preceded by optional hyphen or pound or escape
-        [^\]]+\]    # chars up to closing bracket
-        """,
-        re.VERBOSE,
-    )
-
-    line = PARENS_BRACKET_PAIR.sub(make_parens, line)
-    log.debug(f"{line}")
-    line = PARENS_KEY.sub(lambda match_obj: hyperize(match_obj, bib_chunked), line)
-    log.debug(f"{line}")
-    return line
-
-
-def process_commented_citations(args: argparse.Namespace, line: str) -> str:
-    """Match stuff within a bracket that has no other brackets within."""
-    # TODO 2021-06-18: replace this with a pandoc filter?
-
-    # TODO: harmonize within markdown-wrapper.py and with md2bib.py 2021-06-25
-    PARENS_BRACKET_PAIR = re.compile(
-        r"""
-        [ |^]       # space or caret
-        \[[^\[]+    # open_bracket followed by 1+ non-open_brackets
-        [-#]?@      # at-sign preceded by optional hyphen or pound
-        [^\]]+\]    # 1+ non-closing-brackets, closing bracket
-        """,
-        re.VERBOSE,
-    )
-
-    # log.debug(f"old_line = {line}")
-    new_line = PARENS_BRACKET_PAIR.subn(quash, line)[0]
-    # log.debug(f"new_line = {new_line}")
-    # if I quashed a citation completely, I might have a period after a quote
-    if args.quash_citations and ("]." in line and '".' in new_line):  # imperfect test
-        new_line = new_line.replace('".', '."')
-    return new_line
+    if "@" not in text:  # no citations, skip the regexes
+        return text
+    text = PARENS_BRACKET_PAIR_LINK.sub(make_parens, text)
+    log.debug(f"{text}")
+    text = PARENS_KEY.sub(make_hyperize(bib_chunked), text)
+    log.debug(f"{text}")
+    return text
 
 
-def quash(cite_match: re.Match[str]) -> str:
-    """Collect and rewrite citations.
+def process_commented_citations(args: argparse.Namespace, text: str) -> str:
+    """Match stuff within a bracket that has no other brackets within.
 
-    if args.quash_citations drop commented citations, eg [#@Reagle2012foo]
-    else uncomment
+    text may be a line or a whole document; matches never span lines.
     """
-    citation = cite_match.group(0)
-    log.debug(f"citation = '{citation}'")
-    prefix = "^" if citation[0] == "^" else " "
-    chunks = citation[2:-1].split(";")  # isolate chunks from ' [' + ']'
-    log.debug(f"chunks = {chunks}")
-    citations_keep = []
-    for chunk in chunks:
-        log.debug(f"  chunk = '{chunk}'")
-        if "#@" in chunk:
-            if args.quash_citations:
+    # TODO 2021-06-18: replace this with a pandoc filter?
+    if "@" in text and "[" in text:  # else no bracketed citations to rewrite
+        quash = make_quash(args.quash_citations)
+        new_text = PARENS_BRACKET_PAIR_QUASH.subn(quash, text)[0]
+    else:
+        new_text = text
+    # if I quashed a citation completely, I might have a period after a quote
+    if args.quash_citations and ("]." in text and '".' in new_text):  # imperfect test
+        # quash never adds or removes newlines, so old and new lines pair up
+        new_text = "\n".join(
+            (
+                new_line.replace('".', '."')
+                if "]." in line and '".' in new_line
+                else new_line
+            )
+            for line, new_line in zip(
+                text.split("\n"), new_text.split("\n"), strict=True
+            )
+        )
+    return new_text
+
+
+def make_quash(quash_citations: bool) -> Callable[[re.Match[str]], str]:
+    """Return a quash replacement function with the quash flag bound."""
+
+    def quash(cite_match: re.Match[str]) -> str:
+        """Collect and rewrite citations.
+
+        if quash_citations drop commented citations, eg [#@Reagle2012foo]
+        else uncomment
+        """
+        citation = cite_match.group(0)
+        log.debug(f"citation = '{citation}'")
+        prefix = "^" if citation[0] == "^" else " "
+        chunks = citation[2:-1]  # isolate chunks from ' [' + ']'
+        if quash_citations:
+            # lead every chunk with a separator so one sub drops whole chunks
+            chunks = QUASHED_CHUNK_RE.sub("", ";" + chunks)
+            if not chunks:
                 log.debug("  quashed")
-            else:
-                chunk = chunk.replace("#@", "@")
-                log.debug(f"  keeping chunk = '{chunk}'")
-                citations_keep.append(chunk)
+                return ""
+            chunks = chunks[1:]
         else:
-            citations_keep.append(chunk)
+            chunks = chunks.replace("#@", "@")
+        log.debug(f"citations_keep = '{chunks}'")
+        return f"{prefix}[{chunks}]"
 
-    if citations_keep:
-        log.debug(f"citations_keep = '{citations_keep}'")
-        return f"{prefix}[" + ";".join(citations_keep) + "]"
-    else:
-        return ""
+    return quash
 
 
 def em_mask(matchobj) -> str:
     """Replace emphasis with underscores that pandoc will ignore."""
-    log.debug("return replace function")
     return "&#95;" * len(matchobj.group(0))
 
 
@@ -205,7 +260,9 @@ def make_relpath(path_to: Path | str, path_from: Path | str) -> str:
     log.debug(f"argument {path_to=}")
     if isinstance(path_to, str):
         if path_to.startswith("http"):
-            path_to = WEBROOT / urlparse(path_to).path.lstrip("/")
+            # path of URL without scheme, host, query, or fragment
+            url_path = path_to.partition("://")[2].partition("/")[2]
+            path_to = WEBROOT / url_path.partition("?")[0].partition("#")[0]
         else:
             path_to = Path(path_to)
     log.debug(f"final {path_to=}")
@@ -234,12 +291,29 @@ def make_relpath(path_to: Path | str, path_from: Path | str) -> str:
     return str(result)
 
 
-def create_handout(ori_md_f: Path, intermedia_md_f: Path):
-    """Create handout version of the slide."""
+def redact_handout(content: str) -> str:
+    """Blank slides with an emphasized header and mask other emphasis."""
+    skip_to_next_header = False
+    lines = []
+    for line in content.replace("### ", " ").split("\n"):
+        if line.startswith(("# ", "## ")):
+            skip_to_next_header = " _" in line
+        elif skip_to_next_header:
+            line = "\n"
+        elif "_" in line:  # cheap test before regex
+            line = EM_RE.sub(em_mask, line)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def create_handout(ori_md_f: Path, intermedia_md_f: Path) -> tuple[Popen, Path] | None:
+    """Create handout version of the slide.
+
+    Returns the still-running handout conversion and its markdown file.
+    """
     log.info("HANDOUT START")
     log.info(f"{ori_md_f=}")
     log.info(f"{intermedia_md_f=}")
-    EM_RE = re.compile(r"(?<! _)_([^_]+?)_ ")
 
     md_dir = ori_md_f.parent
     log.info(f"{md_dir=}")
@@ -247,9 +321,7 @@ def create_handout(ori_md_f: Path, intermedia_md_f: Path):
         handout_f = Path(str(ori_md_f).replace("/talks/", "/handouts/"))
         handout_dir = handout_f.parent
         log.info(f"{handout_dir=}")
-        if not handout_dir.exists():
-            handout_dir.mkdir(parents=True)
-        skip_to_next_header = False
+        handout_dir.mkdir(parents=True, exist_ok=True)
         with handout_f.open("w") as handout_fd:
             handout_content = intermedia_md_f.read_text()
             log.info(f"md_dir = '{md_dir}', handout_dir = '{handout_dir}'")
@@ -260,22 +332,11 @@ def create_handout(ori_md_f: Path, intermedia_md_f: Path):
                 .replace("](media/", f"]({relpath_prefix}/media/")
                 .replace('="media/', f'="{relpath_prefix}/media/')
             )
-            for line in handout_content.split("\n"):
-                if args.partial_handout:
-                    log.info("{args.partial_handout=}")
-                    line = line.replace("### ", " ")
-                    if line.startswith(("# ", "## ")):
-                        skip_to_next_header = " _" in line
-                        handout_fd.write(line)
-                    elif not skip_to_next_header:
-                        line = EM_RE.subn(em_mask, line)[0]
-                        log.debug(f"line = '{line}'")
-                        handout_fd.write(line)
-                    else:
-                        handout_fd.write("\n")
-                else:
-                    handout_fd.write(line)
-                handout_fd.write("\n")  # new line at end of line
+            if args.partial_handout:
+                log.info(f"{args.partial_handout=}")
+                handout_content = redact_handout(handout_content)
+            handout_fd.write(handout_content)
+            handout_fd.write("\n")  # new line at end of last line
             deck_link = f"{relpath_prefix}/{ori_md_f.with_suffix('.html').name}"
             deck_link_markup = f"[▶]({deck_link}){{.decklink}}\n"
             handout_fd.write(deck_link_markup)
@@ -290,20 +351,19 @@ def create_handout(ori_md_f: Path, intermedia_md_f: Path):
             str(handout_f),
         ]
         log.info(f" handout {md_cmd=}")
-        call(md_cmd)
-        if not args.keep_tmp:
-            handout_f.unlink()
-    log.info("HANDOUT DONE")
+        log.info("HANDOUT STARTED")
+        return Popen([os.fsencode(arg) for arg in md_cmd]), handout_f
+    return None
 
 
 def number_elements(content: str) -> str:
     """Add section and paragraph marks to content which is parsed as HTML."""
     log.info("parsing without comments")
-    parser = et.HTMLParser(remove_comments=True, remove_blank_text=True)
-    doc = et.parse(StringIO(content), parser)
+    doc = et.parse(StringIO(content), html_parser())
 
     log.debug("add heading marks")
-    headings = doc.xpath("//*[name()='h2' or name()='h3' or name()='h4']")
+    root = doc.getroot()
+    headings = list(root.iter("h2", "h3", "h4"))  # list: we insert as we go
     heading_num = 1
     for heading in headings:
         span = et.Element("span")  # prepare span element for section #
@@ -317,7 +377,9 @@ def number_elements(content: str) -> str:
         heading_num += 1
 
     log.debug("add paragraph marks")
-    paras = doc.xpath("/html/body/p | /html/body/blockquote")
+    paras = []  # p and blockquote children of body
+    if root.tag == "html" and (body := root.find("body")) is not None:
+        paras = [el for el in body if el.tag in ("p", "blockquote")]
     para_num = 1
     for para in paras:
         para_num_str = f"{para_num:0>2}"
@@ -333,11 +395,10 @@ def number_elements(content: str) -> str:
 
     content = tostring(
         doc,
-        method="xml",
-        encoding="utf-8",
-        pretty_print=True,
+        method="html",
+        encoding="unicode",
         include_meta_content_type=True,
-    ).decode("utf-8")
+    )
 
     return content
 
@@ -381,36 +442,37 @@ def pre_pandoc_processing(
         keys = md2bib.get_keys_from_file(abs_fn)
         log.debug(f"keys = {keys}")
         if keys:
-            entries = parse_func(bib_fn.read_text().splitlines())
+            entries = load_bib(bib_fn, parse_func)
             subset = subset_func(entries, keys)
-            emit_subset_func(subset, bib_subset_tmp_fn.open(mode="w"))
+            with bib_subset_tmp_fn.open(mode="w") as bib_subset_fd:
+                emit_subset_func(subset, bib_subset_fd)
             pandoc_opts.extend(
                 [
                     f"--bibliography={bib_subset_tmp_fn}",
                     "--citeproc",
                 ]
             )
-    shutil.copyfile(abs_fn, fn_tmp_1)
-    content = fn_tmp_1.read_text(encoding="UTF-8", errors="replace")
-    if content[0] == codecs.BOM_UTF8.decode("utf8"):
-        content = content[1:]
-    new_lines = []
-    for line in content.split("\n"):
-        # TODO: fix Wikicommons relative network-path references
-        # so the URLs work on local file system (i.e.,'file:///')
-        line = line.replace('src="//', 'src="http://')
-        # TODO: encode ampersands in URLs
-        line = process_commented_citations(args, line)
-        if args.bibliography:  # create hypertext refs from bib db
-            line = link_citations(line, bib_chunked)
-            # log.debug(f"\n** line is now {line}")
-        # Color some revealjs top of column slides
-        if args.presentation and line.startswith("# ") and "{data-" not in line:
-            line = line.strip() + ' {data-background="LightBlue"}\n'
-        # log.debug(f"END line: '{line}'")
-        new_lines.append(line)
-
-    fn_tmp_2.write_text("\n".join(new_lines), encoding="UTF-8", errors="replace")
+    if args.keep_tmp:
+        shutil.copyfile(abs_fn, fn_tmp_1)
+    content = abs_fn.read_text(encoding="UTF-8", errors="replace")
+    content = content.removeprefix("\ufeff")  # BOM
+    # Each pass runs over the whole document; none of them match across lines.
+    # TODO: fix Wikicommons relative network-path references
+    # so the URLs work on local file system (i.e.,'file:///')
+    content = content.replace('src="//', 'src="http://')
+    # TODO: encode ampersands in URLs
+    content = process_commented_citations(args, content)
+    if args.bibliography:  # create hypertext refs from bib db
+        content = link_citations(content, bib_chunked)
+    # Color some revealjs top of column slides
+    if args.presentation:
+        content = TOP_SLIDE_RE.sub(
+            lambda match_obj: match_obj.group(0).strip()
+            + ' {data-background="LightBlue"}\n',
+            content,
+        )
+
+    fn_tmp_2.write_bytes(content.encode("UTF-8", errors="replace"))
 
     return cleanup_tmp_fns, fn_result, fn_tmp_2, fn_tmp_3
 
@@ -519,10 +581,10 @@ def set_pandoc_options(args: argparse.Namespace, fn_path: Path):  # noqa: C901
 
 def post_pandoc_html_processing(
     args: argparse.Namespace, base_fn: Path, fn_result: Path, fn_tmp_3: Path
-) -> Path:
-    """Complete HTML processing after pandoc."""
+) -> tuple[Path, Popen | None]:
+    """Complete HTML processing after pandoc, returning any running tidy."""
     if args.write_format != "html":
-        return fn_result
+        return fn_result, None
     else:
         # final tweaks html file
         shutil.copyfile(fn_result, fn_tmp_3)  # copy of html for debugging
@@ -532,17 +594,15 @@ def post_pandoc_html_processing(
 
         # text alterations
         if args.british_quotes:  # swap double/single quotes
-            content_html = content_html.replace('"', "&ldquo;").replace('"', "&rdquo;")
-            single_quote_re = re.compile(r"(\W)'(.{2,40}?)'(\W)")
-            content_html = single_quote_re.sub(r'\1"\2"\3', content_html)
+            content_html = content_html.replace('"', "&ldquo;")
+            content_html = SINGLE_QUOTE_RE.sub(r'\1"\2"\3', content_html)
             content_html = content_html.replace("&ldquo;", r"'").replace("&rdquo;", "'")
         # correct bibliography
         content_html = content_html.replace(" Vs. ", " vs. ")
 
         if args.presentation:
             # convert to data-src for lazy loading
-            lazy_elements_re = re.compile(r"""(\<img|<iframe|<video)(.*?) src=""")
-            content_html = lazy_elements_re.sub(r"\1\2 data-src=", content_html)
+            content_html = LAZY_ELEMENTS_RE.sub(r"\1\2 data-src=", content_html)
 
         # HTML alterations
         if args.number_elements:
@@ -555,7 +615,7 @@ def post_pandoc_html_processing(
         resulting_html_f.write_text(content_html)
 
         if args.validate:
-            call(
+            return resulting_html_f, Popen(
                 [
                     "tidy",
                     "-utf8",
@@ -568,53 +628,74 @@ def post_pandoc_html_processing(
                     resulting_html_f,
                 ]
             )
-        return resulting_html_f
+        return resulting_html_f, None
 
 
 def process(args: argparse.Namespace):
     """Process files."""
     if args.bibliography:
-        bib_fn = HOME / "joseph/readings.yaml"
-        bib_chunked = md2bib.chunk_yaml(bib_fn.read_text().splitlines())
+        bib_chunked = load_bib(HOME / "joseph/readings.yaml", md2bib.chunk_yaml)
     else:
         bib_chunked = {"": {"": ""}}
 
     log.info(f"args.files = '{args.files}'")
-    for in_file in args.files:
-        if not in_file:
-            continue
-        log.info(f"in_file = '{in_file}'")
-        abs_fn = in_file.resolve()
-        log.info(f"abs_fn = '{abs_fn}'")
-
-        # base_fn, base_ext = splitext(abs_fn)
-        base_fn, base_ext = abs_fn.with_suffix(""), abs_fn.suffix
-        log.info(f"base_fn = '{base_fn}'")
-
-        # os.path.split(abs_fn)[0]
-        fn_path = abs_fn.with_suffix("")
-        log.info(f"fn_path = '{fn_path}'")
-
-        # ##############################
-        # These functions result from breaking up an earlier massive function,
-        # further refactoring should minimize the arguments being passed about.
-        pandoc_inputs, pandoc_opts = set_pandoc_options(args, abs_fn)
-        cleanup_tmp_fns, fn_result, fn_tmp_2, fn_tmp_3 = pre_pandoc_processing(
-            abs_fn, args, base_ext, base_fn, bib_chunked, pandoc_opts
-        )
-        pandoc_processing(abs_fn, args, fn_tmp_2, pandoc_inputs, pandoc_opts)
-        result_fn = post_pandoc_html_processing(args, base_fn, fn_result, fn_tmp_3)
-        # ##############################
+    in_files = [in_file for in_file in args.files if in_file]
+    if len(in_files) > 1:
+        # files are independent and mostly wait on pandoc, so overlap them
+        with ThreadPoolExecutor() as executor:
+            list(
+                executor.map(
+                    functools.partial(process_file, args, bib_chunked=bib_chunked),
+                    in_files,
+                )
+            )
+    else:
+        for in_file in in_files:
+            process_file(args, in_file, bib_chunked)
 
-        if args.write_format == "html" and args.launch_browser:
-            log.info(f"launching {result_fn}")
-            Popen([BROWSER, result_fn])
 
-        if not args.keep_tmp:
-            log.info("removing tmp files")
-            for cleanup_fn in cleanup_tmp_fns:
-                if Path(cleanup_fn).exists():
-                    Path(cleanup_fn).unlink()
+def process_file(
+    args: argparse.Namespace,
+    in_file: Path,
+    bib_chunked: dict[str, dict[str, str]],
+) -> None:
+    """Process a single file."""
+    log.info(f"in_file = '{in_file}'")
+    abs_fn = in_file.resolve()
+    log.info(f"abs_fn = '{abs_fn}'")
+
+    # base_fn, base_ext = splitext(abs_fn)
+    base_fn, base_ext = abs_fn.with_suffix(""), abs_fn.suffix
+    log.info(f"base_fn = '{base_fn}'")
+
+    # ##############################
+    # These functions result from breaking up an earlier massive function,
+    # further refactoring should minimize the arguments being passed about.
+    pandoc_inputs, pandoc_opts = set_pandoc_options(args, abs_fn)
+    cleanup_tmp_fns, fn_result, fn_tmp_2, fn_tmp_3 = pre_pandoc_processing(
+        abs_fn, args, base_ext, base_fn, bib_chunked, pandoc_opts
+    )
+    handout = pandoc_processing(abs_fn, args, fn_tmp_2, pandoc_inputs, pandoc_opts)
+    result_fn, tidy = post_pandoc_html_processing(args, base_fn, fn_result, fn_tmp_3)
+    # ##############################
+
+    # the handout conversion and tidy overlap with the work above
+    if handout:
+        handout_proc, handout_f = handout
+        handout_proc.wait()
+        log.info("HANDOUT DONE")
+        cleanup_tmp_fns.append(handout_f)
+    if tidy:
+        tidy.wait()
+
+    if args.write_format == "html" and args.launch_browser:
+        log.info(f"launching {result_fn}")
+        Popen([BROWSER, result_fn])
+
+    if not args.keep_tmp:
+        log.info("removing tmp files")
+        for cleanup_fn in cleanup_tmp_fns:
+            cleanup_fn.unlink(missing_ok=True)
 
 
 def pandoc_processing(
@@ -623,8 +704,8 @@ def pandoc_processing(
     fn_tmp_2: Path,
     pandoc_inputs: list,
     pandoc_opts: list,
-):
-    """Execute pandoc."""
+) -> tuple[Popen, Path] | None:
+    """Execute pandoc, returning any handout still being created."""
     pandoc_cmd = [
         PANDOC_BIN,
         "-r",
@@ -633,16 +714,16 @@ def pandoc_processing(
     pandoc_cmd.extend(pandoc_opts)
     pandoc_inputs.insert(0, fn_tmp_2)
     pandoc_cmd.extend(pandoc_inputs)
-    # print("joined pandoc_cmd: " + " ".join(pandoc_cmd) + "\n")
-    call(pandoc_cmd)  # , stdout=open(fn_tmp_3, 'w')
+    if log.getLogger().isEnabledFor(log.INFO):
+        log.info("joined pandoc_cmd: " + " ".join(str(arg) for arg in pandoc_cmd))
+    call([os.fsencode(arg) for arg in pandoc_cmd])  # , stdout=open(fn_tmp_3, 'w')
     log.info("done pandoc_cmd")
     if args.presentation:
-        create_handout(abs_fn, fn_tmp_2)
+        return create_handout(abs_fn, fn_tmp_2)
+    return None
 
 
 if __name__ == "__main__":
-    import argparse  # http://docs.python.org/dev/library/argparse.html
-
     arg_parser = argparse.ArgumentParser(
         description="Markdown wrapper with slide and bibliographic options",
         #  formatter_class=argparse.RawTextHelpFormatter,
@@ -852,4 +933,5 @@ if __name__ == "__main__":
 
         doctest.testmod()
         sys.exit()
+    os.environ["PW_PANDOC_BIN"] = str(PANDOC_BIN)  # for handout runs
     process(args)
@@ -9,6 +9,8 @@ using keys found in a markdown file or specified in argument.
 """
 
 import logging as log
+import os
+import pickle
 import re
 import sys
 from inspect import cleandoc  # better than dedent
@@ -16,6 +18,22 @@ from pathlib import Path
 
 HOME = Path.home()
 
+# TODO: harmonize within markdown-wrapper.py and with md2bib.py 2021-06-25
+CITES_RE = re.compile(
+    r"""
+    @\{?        # at-sign followed by optional curly
+    ([\w\-]{1,} # author word_chars
+    -?\d{1,}    # optional BCE minus and 1..4 digit date
+    \w{2,4})    # title suffix eg "teh1"
+    [\.,:;\]\} ]  # terminal token
+    """,
+    re.VERBOSE,
+)
+BIB_KEY_RE = re.compile(r"@(\w+){(.*),")
+BIB_VALUE_RE = re.compile(r"[ ]*(\w+)[ ]*=[ ]*{(.*)},")
+
+YAML_LOOKUP_PREFIXES = ("  URL: ", "  title-short: ", "  original-date:")
+
 
 def chunk_yaml(text) -> dict[str, dict[str, str]]:
     """Return a dictionary of YAML chunks.
@@ -28,7 +46,8 @@ def chunk_yaml(text) -> dict[str, dict[str, str]]:
     yaml_block = []
     key = None
 
-    lines = iter(text[1:])  # skip first two lines of YAML
+    lines = iter(text)
+    next(lines, None)  # skip first two lines of YAML
     for line in lines:
         line = line.rstrip()
         # log.debug(f"{line=}")
@@ -46,39 +65,38 @@ def chunk_yaml(text) -> dict[str, dict[str, str]]:
             yaml_block = [line]
         else:
             yaml_block.append(line)
+            if not line.startswith(YAML_LOOKUP_PREFIXES):  # most lines
+                continue
             if line.startswith("  URL: "):
                 entries[key]["url"] = line[8:-1]  # remove quotes too
             elif line.startswith("  title-short: "):
                 entries[key]["title-short"] = line[16:-1]
-            # grab the original-date as well # 20201102 buggy?
+            # grab the original-date as well
             elif line.startswith("  original-date:"):
-                next_line = next(lines)  # year is on next line
+                next_line = next(lines).rstrip()  # year is on next line
+                yaml_block.append(next_line)
                 if "year" in next_line:
-                    entries[key]["original-date"] = next_line[10:-1]
+                    entries[key]["original-date"] = next_line[10:]
     # log.debug(f"{entries=}")
     return entries
 
 
 def emit_yaml_subset(entries, outfd):
-    """Emit a YAML file."""
-    outfd.write("""---\nreferences:\n""")
-    for identifier in entries:
-        log.debug(f"identifier = '{identifier}'")
-        outfd.write(entries[identifier]["_yaml_block"])
-        outfd.write("\n")
-    outfd.write("""\n...\n""")
+    """Emit a YAML file with a single write."""
+    log.debug("identifiers = %s", entries.keys())  # formatted only if shown
+    parts = ["---\nreferences:\n"]
+    parts.extend(f"{values['_yaml_block']}\n" for values in entries.values())
+    parts.append("\n...\n")
+    outfd.write("".join(parts))
 
 
 def subset_yaml(entries, keys):
     """Emit a susbet of a YAML file based on keys."""
-    subset = {}
-    for key in sorted(keys):
-        if key in entries:
-            subset[key] = entries[key]
-        else:
-            log.critical(f"{key} not in yaml entries")
-            log.critical(f"{entries=}")
-    return subset
+    keys = set(keys)
+    if missing := keys.difference(entries):
+        log.critical("%s not in yaml entries", sorted(missing))
+        log.debug("entries=%r", entries)
+    return {key: entries[key] for key in sorted(keys - missing)}
 
 
 def chunk_bibtex(text):
@@ -89,72 +107,103 @@ def chunk_bibtex(text):
     """
     entries = {}
     key = None
-    key_pat = re.compile(r"@(\w+){(.*),")
-    value_pat = re.compile(r"[ ]*(\w+)[ ]*=[ ]*{(.*)},")
+    key_match_func = BIB_KEY_RE.match  # bind once for the loop
+    value_match_func = BIB_VALUE_RE.match
     for line in text:
-        key_match = key_pat.match(line)
-        if key_match:
-            entry_type = key_match.group(1)
-            key = key_match.group(2)
-            entries[key] = {"entry_type": entry_type}
+        if line.startswith("@"):  # only entry lines can match BIB_KEY_RE
+            key_match = key_match_func(line)
+            if key_match:
+                entry_type = key_match.group(1)
+                key = key_match.group(2)
+                entries[key] = {"entry_type": entry_type}
             continue
-        value_match = value_pat.match(line)
+        value_match = value_match_func(line)
         if value_match:
             field, value = value_match.groups()
             entries[key][field] = value
     return entries
 
 
+def format_bibtex_entry(identifier, values) -> str:
+    """Return a single bibtex entry as a string."""
+    parts = ["@{}{{{},\n".format(values["entry_type"], identifier)]
+    parts.extend(
+        f"   {field} = {{{value}}},\n"
+        for field, value in values.items()
+        if field != "entry_type"
+    )
+    parts.append("}\n")
+    return "".join(parts)
+
+
 def emit_bibtex_entry(identifier, values, outfd):
     """Emit a single bibtex entry."""
     log.debug("writing entry")
-    outfd.write("@{}{{{},\n".format(values["entry_type"], identifier))
-    for field, value in values.items():
-        if field != "entry_type":
-            outfd.write(f"   {field} = {{{value}}},\n")
-    outfd.write("}\n")
+    outfd.write(format_bibtex_entry(identifier, values))
 
 
 def emit_bibtex_subset(entries, outfd):
-    """Emit a biblatex file."""
-    for identifier, values in entries.items():
-        emit_bibtex_entry(identifier, values, outfd)
+    """Emit a biblatex file with a single write."""
+    outfd.write(
+        "".join(
+            format_bibtex_entry(identifier, values)
+            for identifier, values in entries.items()
+        )
+    )
 
 
 def subset_bibtex(entries, keys):
     """Emit a susbet of a biblatex file based on keys."""
-    subset = {}
-    for key in sorted(keys):
-        if key in entries:
-            subset[key] = entries[key]
-        else:
-            log.critical(f"{key} not in bibtex entries")
-    return subset
+    keys = set(keys)
+    if missing := keys.difference(entries):
+        log.critical("%s not in bibtex entries", sorted(missing))
+    return {key: entries[key] for key in sorted(keys - missing)}
+
+
+def chunk_cached(bib_fn: Path, chunk_func) -> dict[str, dict[str, str]]:
+    """Return chunked entries of bib_fn, using a pickle cache if it is current.
+
+    The cache is stored beside bib_fn, stamped with the mtime and size bib_fn
+    had when parsed, and is rebuilt when either differs.
+    """
+    cache_fn = bib_fn.with_name(f"{bib_fn.name}.cache.pkl")
+    bib_stat = bib_fn.stat()  # before parsing: edits made during it invalidate
+    stamp = (bib_stat.st_mtime_ns, bib_stat.st_size)
+    try:
+        with cache_fn.open("rb") as cache_fd:
+            if pickle.load(cache_fd) == stamp:  # stamp precedes the entries
+                log.debug("using cache_fn=%r", cache_fn)
+                return pickle.load(cache_fd)
+        log.debug("stale cache_fn=%r", cache_fn)
+    except Exception as err:  # noqa: BLE001 ; any unreadable cache is a miss
+        log.debug("cache miss cache_fn=%r: %s", cache_fn, err)
+    with bib_fn.open() as bib_fd:  # iterate lines lazily
+        entries = chunk_func(bib_fd)
+    # write then rename, so concurrent runs never read a partial cache
+    tmp_fn = cache_fn.with_name(f"{cache_fn.name}.{os.getpid()}.tmp")
+    try:
+        with tmp_fn.open("wb") as cache_fd:
+            pickle.dump(stamp, cache_fd, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(entries, cache_fd, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_fn.replace(cache_fn)
+    except OSError as err:
+        log.warning("could not write cache_fn=%r: %s", cache_fn, err)
+        tmp_fn.unlink(missing_ok=True)
+    return entries
 
 
 def get_keys_from_file(source_filename: Path) -> list[str]:
     """Return a list of keys used in a markdown file."""
-    log.debug(f"{source_filename=}'")
+    log.debug("source_filename=%r", source_filename)
     text = source_filename.read_text()
     return get_keys_from_string(text)
 
 
 def get_keys_from_string(text: str) -> list[str]:
-    """Return a list of keys from string."""
-    # TODO: harmonize within markdown-wrapper.py and with md2bib.py 2021-06-25
-    CITES_RE = re.compile(
-        r"""
-        @\{?        # at-sign followed by optional curly
-        ([\w\-]{1,} # author word_chars
-        -?\d{1,}    # optional BCE minus and 1..4 digit date
-        \w{2,4})    # title suffix eg "teh1"
-        [\.,:;\]\} ]  # terminal token
-        """,
-        re.VERBOSE,
-    )
-
-    finds = CITES_RE.findall(text)
-    return finds
+    """Return a list of unique keys from string, in order of first use."""
+    if "@" not in text:  # cheap substring test before regex scan
+        return []
+    return list(dict.fromkeys(CITES_RE.findall(text)))
 
 
 TEST_IN = cleandoc(
@@ -232,6 +281,7 @@ if __name__ == "__main__":
         nargs=1,
         metavar="MD_FILE",
         help="use citations in file",
+        type=Path,
     )
     arg_parser.add_argument(
         "-k",
@@ -294,8 +344,6 @@ if __name__ == "__main__":
             print(f"difference: {set(TEST_OUT) ^ set(results)}")
         sys.exit()
 
-    outfd = args.out_filename.open("w") if args.out_filename else sys.stdout
-
     # debug("args.filename = %s" % (args.filename))
     if not args.filename:
         if args.BIBTEX:
@@ -305,31 +353,38 @@ if __name__ == "__main__":
             args.filename = HOME / "joseph/readings.yaml"
             chunk_func = chunk_yaml
     else:
-        fn, ext = args.filename.stem, args.filename.suffix
-        log.debug(f"ext = {ext}")
+        ext = args.filename.suffix
+        log.debug("ext = %s", ext)
         if ext == ".bib":
             chunk_func = chunk_bibtex
             args.BIBTEX = True
         else:
             chunk_func = chunk_yaml
 
-    log.debug(f"args.filename = {args.filename}")
-    log.debug(f"chunk_func = {chunk_func}")
-    entries = chunk_func(args.filename.open().readlines())
+    log.debug("args.filename = %s", args.filename)
+    log.debug("chunk_func = %s", chunk_func)
+    entries = chunk_cached(args.filename, chunk_func)
 
     if args.keys:
         keys = [key.strip() for key in args.keys[0].split(",")]
-        log.debug(f"arg keys = '{keys}'")
+        log.debug("arg keys = '%s'", keys)
     elif args.find_keys:
         keys = get_keys_from_file(args.find_keys[0])
-        log.debug(f"md  keys = '{keys}'")
+        log.debug("md  keys = '%s'", keys)
     else:
         print("No keys given")
         sys.exit()
 
+    outfd = (
+        args.out_filename.open("w", encoding="utf-8")
+        if args.out_filename
+        else sys.stdout
+    )
     if args.BIBTEX:
         subset = subset_bibtex(entries, keys)
         emit_bibtex_subset(subset, outfd)
     else:
         subset = subset_yaml(entries, keys)
         emit_yaml_subset(subset, outfd)
+    if outfd is not sys.stdout:
+        outfd.close()
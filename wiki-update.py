@@ -7,11 +7,16 @@ ob-/* (obsidian) -> html
 *.md (pandoc)-> html
 """
 
+import argparse
+import hashlib
 import logging as log
 import os
 import re
 import shutil
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from stat import S_ISREG
 from subprocess import PIPE, Popen, call
 
 from bs4 import BeautifulSoup  # type: ignore
@@ -27,51 +32,77 @@ TEMPLATES_FOLDER = HOME / ".pandoc/templates"
 if not all([HOME, BROWSER, PANDOC_BIN, MD_BIN, OBS_EXPORT_BIN, TEMPLATES_FOLDER]):
     raise FileNotFoundError("Your environment is not configured correctly")
 
+# markdown-wrapper.py arguments by kind of markdown file
+COURSES = ("/oc/", "/cda/")  # talks for these get partial handouts
+CC_ARGS = ("--quash", "--number-elements", "--style-csl", "chicago-fullnote-nobib.csl")
+PAPERS_ARGS = ("-c", "https://reagle.org/joseph/2003/papers.css")
+# multimarkdown metadata line with extra build options
+MD_OPTS_RE = re.compile('^md_opts_: "?(.*)"?', re.MULTILINE)
+
 #################################
 # Export Obsidian markdown to standard markdown.
 #################################
 
 
-def export_obsidian(vault_dir: Path, export_dir: Path) -> None:
-    """Call obsidian-export on source; copy source's mtimes to target."""
-    export_cmd = f"{OBS_EXPORT_BIN} {vault_dir} {export_dir}"
-    log.info(f"{export_cmd=}")
+def export_obsidian(vaults: list[tuple[Path, Path]]) -> None:
+    """Call obsidian-export on sources; copy source's mtimes to targets.
+
+    All exports are started at once, then each is finished in turn.
+    """
+    exports = []
+    for vault_dir, export_dir in vaults:
+        export_cmd = [OBS_EXPORT_BIN, vault_dir, export_dir]
+        log.info("export_cmd=%r", export_cmd)
+
+        print(f"exporting {vault_dir}")
+        results = Popen(export_cmd, stdout=PIPE, stderr=PIPE, text=True)
+        exports.append((vault_dir, export_dir, results))
 
-    print(f"exporting {vault_dir}")
-    results = Popen((export_cmd), stdout=PIPE, stderr=PIPE, shell=True, text=True)
-    results_out, results_sdterr = results.communicate()
-    if results_sdterr:
-        print(f"{results_sdterr}")
-    copy_mtime(vault_dir, export_dir)
+    for vault_dir, export_dir, results in exports:
+        _, results_sdterr = results.communicate()
+        if results_sdterr:
+            print(f"{results_sdterr}")
+        copy_mtime(vault_dir, export_dir)
 
-    remove_empty_or_hidden_folders(export_dir)
-    review_created_or_deleted_files(vault_dir, export_dir)
-    if has_dir_changed(export_dir):
-        log.warning(f"{dir=} has changed")
-        create_index(vault_dir, export_dir)
+        remove_empty_or_hidden_folders(export_dir)
+        review_created_or_deleted_files(vault_dir, export_dir)
+        if has_dir_changed(export_dir):
+            log.warning("export_dir=%r has changed", export_dir)
+            create_index(vault_dir, export_dir)
 
 
 def create_index(vault_path: Path, export_path: Path) -> None:
     """Create a new HTML index for the export vault."""
-    log.info(f"creating index for {vault_path}")
+    log.info("creating index for %s", vault_path)
     vault_index_file = vault_path / "_index.md"
     export_index_file = export_path / "_index.md"
 
-    with vault_index_file.open("w") as output_file:
-        output_file.write(f"# Index of {vault_path.name}\n")
-        for path in vault_path.glob("**/*.md"):
-            relative_path = path.relative_to(vault_path)
-            link_text = f"[{relative_path.with_suffix('')}]({relative_path})"
-            depth = len(relative_path.parts) - 1
-            indentation = "  " * depth
-            output_file.write(f"{indentation}- {link_text}\n")
+    lines = [f"# Index of {vault_path.name}\n"]
+    vault_prefix = f"{vault_path}/"
+    for entry in walk_files(vault_path):
+        if not entry.name.endswith(".md"):
+            continue
+        # format from the relative string; a Path per note is not needed
+        relative_path = entry.path.removeprefix(vault_prefix)
+        link_text = f"[{relative_path.removesuffix('.md')}]({relative_path})"
+        indentation = "  " * relative_path.count("/")
+        lines.append(f"{indentation}- {link_text}\n")
+    vault_index_file.write_text("".join(lines))
 
     shutil.copy2(vault_index_file, export_index_file)
-    log.info(f"created {output_file=} and {export_index_file=}")
-    log.debug(
-        f"{vault_index_file} {vault_index_file.stat().st_mtime} "
-        f"> {export_index_file} {export_index_file.stat().st_mtime}"
+    log.info(
+        "created vault_index_file=%r and export_index_file=%r",
+        vault_index_file,
+        export_index_file,
     )
+    if log.getLogger().isEnabledFor(log.DEBUG):  # stat only when shown
+        log.debug(
+            "%s %s > %s %s",
+            vault_index_file,
+            vault_index_file.stat().st_mtime,
+            export_index_file,
+            export_index_file.stat().st_mtime,
+        )
 
 
 #################################
@@ -79,7 +110,7 @@ def create_index(vault_path: Path, export_path: Path) -> None:
 #################################
 
 
-def find_convert_md(source_path: Path) -> None:
+def find_convert_md(args: argparse.Namespace, source_path: Path) -> None:
     """Find and convert any markdown file whose HTML file is older than it."""
     # TODO: have this work when output format is docx or odt.
     #   2020-03-11: attempted but difficult, need to:
@@ -88,69 +119,90 @@ def find_convert_md(source_path: Path) -> None:
     #     - don't update where docx is newer than md, but older than html?
     #   2020-09-17: possible hack: always generate HTML in addition to docx
 
+    if not source_path.is_dir():  # e.g., a machine without this folder
+        log.info("skipping missing source_path=%r", source_path)
+        return
+
     files_to_process = []
 
-    for fn_md in source_path.glob("**/*.md"):
-        fn_html = fn_md.with_suffix(".html")
-        if fn_html.exists():
-            if fn_md.stat().st_mtime > fn_html.stat().st_mtime:
+    # one walk indexes both; the entries cache the stats compared below
+    md_entries = []
+    html_entries = {}
+    for entry in walk_files(source_path):
+        if entry.name.endswith(".md"):
+            md_entries.append(entry)
+        elif entry.name.endswith(".html"):
+            html_entries[entry.path.removesuffix(".html")] = entry
+
+    for md_entry in md_entries:
+        html_entry = html_entries.get(md_entry.path.removesuffix(".md"))
+        if html_entry:
+            md_mtime = md_entry.stat().st_mtime
+            html_mtime = html_entry.stat().st_mtime
+            if md_mtime > html_mtime:
                 log.debug(
-                    f"""{fn_md} {fn_md.stat().st_mtime} """
-                    + f"""> {fn_html} {fn_html.stat().st_mtime}"""
+                    "%s %s > %s %s",
+                    md_entry.path,
+                    md_mtime,
+                    html_entry.path,
+                    html_mtime,
                 )
-                files_to_process.append(fn_md)
+                files_to_process.append(Path(md_entry.path))
 
-    log.info(f"{files_to_process=}")
-    invoke_md_wrapper(files_to_process)
+    log.info("files_to_process=%r", files_to_process)
+    invoke_md_wrapper(args, files_to_process)
 
 
-def invoke_md_wrapper(files_to_process: list[Path]) -> None:
+def invoke_md_wrapper(args: argparse.Namespace, files_to_process: list[Path]) -> None:
     """Configure arguments for `markdown-wrapper.py` and invoke."""
-    for fn_md in files_to_process:
-        log.info(f"updating fn_md {fn_md}")
-        path_md = Path(fn_md)
-        content = path_md.read_text()
-        md_cmd = [MD_BIN]
-        md_args = []
-        # TODO: instead of this pass-through hack, use MD_BIN as a library
-        if args.verbose > 0:
-            md_args.extend([f"-{args.verbose * 'V'}"])
-        tmp_body_fn = None  # temporary store body of MM HTML
-
-        if "talks" in str(path_md):
-            md_args.extend(["--presentation"])
-            COURSES = ["/oc/", "/cda/"]
-            if any(course in str(path_md) for course in COURSES):
-                md_args.extend(["--partial-handout"])
-            if "[@" in content:
-                md_args.extend(["--bibliography"])
-        elif "cc/" in str(path_md):
-            md_args.extend(["--quash"])
-            md_args.extend(["--number-elements"])
-            md_args.extend(["--style-csl", "chicago-fullnote-nobib.csl"])
-        elif "ob-" in str(path_md):
-            md_args.extend(["--metadata", f"title={path_md.stem}"])
-            md_args.extend(["--lua-filter", "obsidian-export.lua"])
-            md_args.extend(
-                [
-                    "--include-after-body",
-                    f"{TEMPLATES_FOLDER}/obsidian-footer.html",
-                ]
-            )
-        else:
-            md_args.extend(["-c", "https://reagle.org/joseph/2003/papers.css"])
-        # check for a multimarkdown metadata line with extra build options
-        match_md_opts = re.search('^md_opts_: "?(.*)"?', content, re.MULTILINE)
-        if match_md_opts:
-            md_opts = match_md_opts.group(1).strip().split(" ")
-            log.debug(f"{md_opts=}")
-            md_args.extend(md_opts)
-        md_cmd.extend(md_args)
-        md_cmd.extend([path_md])
-        md_cmd = list(filter(None, md_cmd))  # remove any empty strings
-        call(md_cmd)
-        if tmp_body_fn:
-            Path(tmp_body_fn).unlink()
+    md_cmds = [md_wrapper_command(args, fn_md) for fn_md in files_to_process]
+    if args.sequential or len(md_cmds) < 2:
+        for md_cmd in md_cmds:
+            call(md_cmd)
+    else:
+        # each conversion is its own process, threads need only wait on them
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            list(executor.map(call, md_cmds))
+
+
+def md_wrapper_command(args: argparse.Namespace, fn_md: Path) -> list:
+    """Return the `markdown-wrapper.py` command for a markdown file."""
+    log.info("updating fn_md %s", fn_md)
+    path_md = Path(fn_md)
+    path_str = str(path_md)
+    content = path_md.read_text()
+    md_args = []
+    # TODO: instead of this pass-through hack, use MD_BIN as a library
+    if args.verbose > 0:
+        md_args.append(f"-{args.verbose * 'V'}")
+
+    if "talks" in path_str:
+        md_args.append("--presentation")
+        if any(course in path_str for course in COURSES):
+            md_args.append("--partial-handout")
+        if "[@" in content:
+            md_args.append("--bibliography")
+    elif "cc/" in path_str:
+        md_args += CC_ARGS
+    elif "ob-" in path_str:
+        md_args += (
+            "--metadata",
+            f"title={path_md.stem}",
+            "--lua-filter",
+            "obsidian-export.lua",
+            "--include-after-body",
+            f"{TEMPLATES_FOLDER}/obsidian-footer.html",
+        )
+    else:
+        md_args += PAPERS_ARGS
+    # check for a multimarkdown metadata line with extra build options
+    match_md_opts = MD_OPTS_RE.search(content)
+    if match_md_opts:
+        md_opts = match_md_opts.group(1).strip().split(" ")
+        log.debug("md_opts=%r", md_opts)
+        md_args.extend(md_opts)
+    # drop empty strings, such as from doubled spaces in md_opts
+    return [MD_BIN, *(arg for arg in md_args if arg), path_str]
 
 
 #################################
@@ -176,8 +228,8 @@ def transclude(
     """Transclude the source_page into the receiving_page using CSS selectors."""
     content_receiving = Path(receiving_page).read_text().strip()
     content_source = Path(source_page).read_text().strip()
-    receiving_soup = BeautifulSoup(content_receiving, "html.parser")
-    source_soup = BeautifulSoup(content_source, "html.parser")
+    receiving_soup = BeautifulSoup(content_receiving, "lxml")
+    source_soup = BeautifulSoup(content_source, "lxml")
 
     # Remove Obsidian header and footer
     remove_chunks(source_soup, remove_selectors)
@@ -203,25 +255,30 @@ def transclude(
 
 def has_dir_changed(path: Path) -> bool:
     """Check if content of folder has changed."""
-    log.info(f"{path=}")
+    log.info("path=%r", path)
     if not path.is_dir():
         raise NotADirectoryError(f"{path} is not a directory")
 
     checksum_file = path / ".dirs.md5sum"
-    checksum = Popen([f"ls -R {path} | md5sum"], shell=True, stdout=PIPE).communicate()[
-        0
-    ]
-    checksum = checksum.split()[0].decode("utf-8")
+    # hash the names in the tree, as `ls -R | md5sum` would, without the shell
+    digest = hashlib.md5(usedforsecurity=False)
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+        digest.update(os.fsencode(root) + b"\n")
+        visible_files = [fn for fn in files if not fn.startswith(".")]
+        for name in sorted(dirs + visible_files):
+            digest.update(os.fsencode(name) + b"\n")
+    checksum = digest.hexdigest()
 
     if not checksum_file.exists():
         with checksum_file.open("w") as file:
             file.write(checksum)
-        log.debug(f"checksum created {checksum}")
+        log.debug("checksum created %s", checksum)
         return True
     else:
-        log.debug(f"{checksum_file=}")
+        log.debug("checksum_file=%r", checksum_file)
         state = checksum_file.read_text()
-        log.debug(f"{state=}")
+        log.debug("state=%r", state)
         if checksum == state:
             log.debug("checksum == state")
             return False
@@ -241,14 +298,14 @@ def remove_empty_or_hidden_folders(path: Path, hide_prefix: str = "_") -> bool:
     def is_empty(folder: Path) -> bool:
         return not any(folder.iterdir())
 
-    log.info(f"check for empty or hidden folders {path=}")
+    log.info("check for empty or hidden folders path=%r", path)
     did_remove = False
     folders = sorted(path.rglob("**/"))  # returns all descendant folders
     for folder in folders:
         if is_empty(folder) or folder.name.startswith(hide_prefix):
             shutil.rmtree(folder)
             did_remove = True
-            log.info(f"  Removed folder: {folder}")
+            log.info("  Removed folder: %s", folder)
     return did_remove
 
 
@@ -262,23 +319,37 @@ def review_created_or_deleted_files(src_path: Path, dst_path: Path) -> bool:
     (Renamed files are simply deleted and created.)
     """
     has_changed = False
-    log.info(f"checking for new markdown files in {dst_path}")
-    for dst_md_file in dst_path.glob("**/*.md"):
-        log.info(f"  {dst_md_file=}")
-        html_file = dst_md_file.with_suffix(".html")
-        if not html_file.exists():
+    log.info("checking for new or deleted markdown files in %s", dst_path)
+    # index both trees once rather than probe for each file's counterparts
+    src_prefix = f"{src_path}/"
+    src_md_files = {
+        entry.path.removeprefix(src_prefix)
+        for entry in walk_files(src_path)
+        if entry.name.endswith(".md")
+    }
+    dst_prefix = f"{dst_path}/"
+    dst_md_files = []
+    dst_html_files = set()
+    for entry in walk_files(dst_path):
+        if entry.name.endswith(".md"):
+            dst_md_files.append(entry.path.removeprefix(dst_prefix))
+        elif entry.name.endswith(".html"):
+            dst_html_files.add(entry.path.removeprefix(dst_prefix))
+
+    for relative_md in dst_md_files:
+        dst_md_file = dst_path / relative_md
+        log.info("  dst_md_file=%r", dst_md_file)
+        relative_html = relative_md.removesuffix(".md") + ".html"
+        html_file = dst_path / relative_html
+        if relative_md not in src_md_files:
+            dst_md_file.unlink()
+            html_file.unlink(missing_ok=True)
+            log.info("deleted %s", dst_md_file)
+            has_changed = True
+        elif relative_html not in dst_html_files:
             html_file.touch()
             os.utime(html_file, (0, 0))
-            log.info(f"created {html_file}")
-            has_changed = True
-
-    log.info(f"checking for deleted markdown files in {src_path}")
-    for dst_md_file in dst_path.glob("**/*.md"):
-        src_md_file = src_path / dst_md_file.relative_to(dst_path)
-        if not src_md_file.exists():
-            dst_md_file.unlink()
-            dst_md_file.with_suffix(".html").unlink()
-            log.info(f"deleted {dst_md_file}")
+            log.info("created %s", html_file)
             has_changed = True
 
     return has_changed
@@ -288,7 +359,7 @@ def chmod_recursive(
     path: Path, dir_perms: int = 0o755, file_perms: int = 0o644
 ) -> None:
     """Fix permissions on a generated/exported tree if needed."""
-    log.debug(f"changing perms to {dir_perms:o};{file_perms:o} on {path=}")
+    log.debug("changing perms to %o;%o on path=%r", dir_perms, file_perms, path)
 
     for item in path.rglob("*"):
         if item.is_dir():
@@ -306,38 +377,60 @@ def copy_mtime(src_path: Path, dst_path: Path) -> None:
     if not src_path.is_dir() or not dst_path.is_dir():
         raise ValueError("Both arguments should be valid directory paths.")
 
-    for src_fn in src_path.glob("**/*"):
-        if src_fn.is_file():
-            # Create a corresponding target file path
-            relative_path = src_fn.relative_to(src_path)
-            dst_fn = dst_path.joinpath(relative_path)
-
-            if dst_fn.exists() and dst_fn.is_file():
-                # find_convert_md_f time of the source file
-                src_mtime = src_fn.stat().st_mtime
-
-                # Apply the modified time to the destination file
-                os.utime(dst_fn, (dst_fn.stat().st_atime, src_mtime))
+    def copy_file_mtime(src_entry: os.DirEntry) -> None:
+        # Create a corresponding target file path
+        dst_fn = dst_path / Path(src_entry.path).relative_to(src_path)
+        try:
+            dst_stat = dst_fn.stat()
+        except FileNotFoundError:
+            return
+        if not S_ISREG(dst_stat.st_mode):
+            return
+        # Apply the modified time of the source file, unless already equal
+        src_mtime_ns = src_entry.stat().st_mtime_ns
+        if dst_stat.st_mtime_ns != src_mtime_ns:
+            os.utime(dst_fn, ns=(dst_stat.st_atime_ns, src_mtime_ns))
+
+    # stat/utime block in the kernel, so threads overlap them
+    with ThreadPoolExecutor() as executor:
+        for _ in executor.map(copy_file_mtime, walk_files(src_path)):
+            pass
+
+
+def walk_files(path: Path | str) -> Iterator[os.DirEntry]:
+    """Yield an entry for every file below path; entries cache their stat."""
+    subdirs = []
+    try:
+        entries = os.scandir(path)
+    except OSError as err:  # skip missing or unreadable folders, as glob does
+        log.debug("skipping %s: %s", path, err)
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                yield entry
+    for subdir in subdirs:  # files before subfolders, as glob orders them
+        yield from walk_files(subdir)
 
 
 def reset_folder(folder_path: Path) -> None:
     """Remove and remake a folder."""
-    log.info(f"removing/recreating {folder_path=}")
+    log.info("removing/recreating folder_path=%r", folder_path)
     if folder_path.exists():
         shutil.rmtree(folder_path)
     folder_path.mkdir(parents=True, exist_ok=True)
     if folder_path.exists():
-        log.info(f"{folder_path} creation succeeded.")
+        log.info("%s creation succeeded.", folder_path)
     else:
-        log.info(f"{folder_path} creation failed.")
+        log.info("%s creation failed.", folder_path)
 
 
 ##################################
 
 
 if __name__ == "__main__":
-    import argparse  # http://docs.python.org/dev/library/argparse.html
-
     arg_parser = argparse.ArgumentParser(
         description="Build static HTML versions of various files"
     )
@@ -395,25 +488,31 @@ if __name__ == "__main__":
     else:
         log.basicConfig(level=log_level, format=LOG_FORMAT)
 
+    # markdown-wrapper.py runs reuse this pandoc rather than search PATH
+    os.environ["PW_PANDOC_BIN"] = str(PANDOC_BIN)
+
     ## Obsidian vault ##
 
     if args.force_update:
         reset_folder(HOME / "joseph/ob-web")
         reset_folder(HOME / "joseph/plan/ob-web")
 
-    # Private planning vault
-    export_obsidian(HOME / "joseph/plan/ob-plan/", HOME / "joseph/plan/ob-web")
-
-    # Public codex vault
-    export_obsidian(HOME / "joseph/ob-codex/", HOME / "joseph/ob-web")
+    export_obsidian(
+        [
+            # Private planning vault
+            (HOME / "joseph/plan/ob-plan/", HOME / "joseph/plan/ob-web"),
+            # Public codex vault
+            (HOME / "joseph/ob-codex/", HOME / "joseph/ob-web"),
+        ]
+    )
 
     ## Markdown files ##
 
     # Private markdown files
-    find_convert_md(HOME / "data/1work/")
+    find_convert_md(args, HOME / "data/1work/")
 
     # Public markdown files
-    find_convert_md(HOME / "joseph/")
+    find_convert_md(args, HOME / "joseph/")
 
     # Transclude Obsidian Home.html into my planning page
     planning_page = HOME / "joseph/plan/index.html"
@@ -425,4 +524,8 @@ if __name__ == "__main__":
         remove_selectors=["div#obsidian-footer", "header"],
     )
     if modified_html:
-        planning_page.write_text(modified_html)
+        # write then rename, so a failed run never leaves a truncated page
+        tmp_page = planning_page.with_name(f"{planning_page.name}.tmp")
+        tmp_page.write_text(modified_html)
+        shutil.copymode(planning_page, tmp_page)
+        tmp_page.replace(planning_page)